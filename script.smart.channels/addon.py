@@ -6,8 +6,14 @@ import urllib.parse
 import xml.etree.ElementTree as ET
 import random
 import os
+import sys
+import hashlib
 import sqlite3
+import time
 import xbmcaddon
+from array import array
+from collections import deque
+from itertools import accumulate
 from datetime import datetime
 import threading
 
@@ -18,8 +24,33 @@ addon_id = addon.getAddonInfo("id")
 data_path = xbmcvfs.translatePath(addon.getAddonInfo("profile"))
 settings_file = os.path.join(data_path, "settings.json")
 channels_file = os.path.join(data_path, "channels.json")
+shared_state_file = os.path.join(data_path, "shared_cache_state.json")
+lineup_file = os.path.join(data_path, "lineup.m3u")
+lineup_dir = os.path.join(data_path, "lineup")
+collision_dir = os.path.join(data_path, "collision")
+fingerprints_file = os.path.join(data_path, "fingerprints.json")
+playlist_stats_file = os.path.join(data_path, "playlist_stats.json")
 channel_lock = threading.Lock()
 
+# Shared schedule cache (one builder, many clients reading the same directory)
+SHARED_CACHE_FORMAT = 1
+SHARED_CACHE_MODES = ["off", "builder", "client"]
+
+# M3U output: one file per channel, or one combined lineup built from per-channel sections
+M3U_OUTPUT_MODES = ["channels", "lineup"]
+
+# Channel builds: modal dialog or background progress bar, progress updated at most 4 times a second
+BUILD_PROGRESS_MODES = ["dialog", "background"]
+PROGRESS_UPDATE_INTERVAL = 0.25
+BUILD_CANCEL_PROPERTY = f"{addon_id}.cancel_builds"
+
+# Cross-channel collisions: how many upcoming episodes of a show may be skipped to avoid one
+COLLISION_LOOKAHEAD = 5
+
+# Playlist picker statistics, served from an index that is refreshed in the background
+PLAYLIST_STATS_FORMAT = 1
+PLAYLIST_DIRS = ["special://profile/playlists/video/", "special://profile/playlists/mixed/"]
+
 # Get the addon instance and basic info
 #addon = xbmcaddon.Addon()
 #addon_name = addon.getAddonInfo('name')
@@ -77,8 +108,9 @@ def save_channels(channels):
     try:
         # Sort channels by number before saving
         channels = sorted(channels, key=lambda x: int(x['number']) if x['number'].isdigit() else float('inf'))
-        with xbmcvfs.File(channels_file, 'w') as f:
-            json.dump(channels, f, indent=4)
+        # Other script instances may be reading channels.json while it is saved
+        if not atomic_write(channels_file, json.dumps(channels, indent=4)):
+            raise IOError(f"Could not write {channels_file}")
         xbmc.log(f"{addon_name}: Saved channels to {channels_file}", level=xbmc.LOGINFO)
     except Exception as e:
         xbmc.log(f"{addon_name}: Failed to save channels: {str(e)}", level=xbmc.LOGERROR)
@@ -97,20 +129,10 @@ def delete_all_channels():
     if confirm:
         # Load channels to get their numbers
         channels = load_channels()
-        addon_data_path = xbmcvfs.translatePath('special://profile/addon_data/script.smart.channels/')
-        
-        # Delete associated M3U files
-        for channel in channels:
-            m3u_path = os.path.join(addon_data_path, f"channel_{channel['number']}.m3u")
-            if os.path.exists(m3u_path):
-                try:
-                    os.remove(m3u_path)
-                    xbmc.log(f"{addon_name}: Deleted M3U file {m3u_path}", level=xbmc.LOGINFO)
-                except Exception as e:
-                    xbmc.log(f"{addon_name}: Failed to delete M3U file {m3u_path}: {e}", level=xbmc.LOGERROR)
-        
-        # Clear channels.json
+
+        # Clear channels.json, then delete associated M3U files and lineup sections
         save_channels([])
+        remove_channel_outputs([channel["number"] for channel in channels])
         xbmc.log(f"{addon_name}: All channels deleted from channels.json", level=xbmc.LOGINFO)
         dialog.ok(addon_name, "All channels deleted successfully.")
     else:
@@ -133,8 +155,68 @@ def get_playlist_sort_order(playlist_path):
         xbmc.log(f"{addon_name}: Error parsing playlist {playlist_path}: {str(e)}", level=xbmc.LOGERROR)
         return "episode"
 
-def get_episodes_from_playlist(playlist_path):
-    """Retrieve episodes from a Smart Playlist by parsing its rules and querying episode metadata."""
+class PathTable:
+    """Table of directory prefixes shared by all episodes, so each directory string is stored once."""
+    def __init__(self):
+        self.paths = []
+        self.ids = {}
+        self._lock = threading.Lock()
+
+    def add(self, directory):
+        """Return the id for directory, adding it to the table if needed."""
+        path_id = self.ids.get(directory)
+        if path_id is None:
+            # Builds and the playlist statistics refresh add paths from different threads
+            with self._lock:
+                path_id = self.ids.get(directory)
+                if path_id is None:
+                    path_id = len(self.paths)
+                    self.paths.append(directory)
+                    self.ids[directory] = path_id
+        return path_id
+
+episode_paths = PathTable()
+
+class Episode:
+    """Compact episode record built from a VideoLibrary.GetEpisodes result.
+
+    Show titles are interned and directories live in the shared episode_paths table, so a large
+    library holds one copy of each instead of one per episode dict.
+    """
+    __slots__ = ("showtitle", "season", "episode", "title", "path_id", "filename", "runtime", "tvshowid", "file_id")
+
+    def __init__(self, showtitle, season, episode, title, file_path, runtime=0, tvshowid=-1):
+        self.showtitle = sys.intern(showtitle)
+        self.season = season
+        self.episode = episode
+        self.title = title
+        # Split after the last separator so directory + filename gives back the exact path
+        split_at = max(file_path.rfind("/"), file_path.rfind("\\")) + 1
+        self.path_id = episode_paths.add(file_path[:split_at])
+        self.filename = file_path[split_at:]
+        self.runtime = runtime
+        self.tvshowid = tvshowid
+        self.file_id = None  # idFile in the video library, set when the duration is looked up
+
+    @classmethod
+    def from_jsonrpc(cls, ep):
+        """Build an Episode from one entry of a VideoLibrary.GetEpisodes response."""
+        return cls(ep.get("showtitle", "Unknown"), ep.get("season", 0), ep.get("episode", 0), ep.get("title", "Unknown"),
+                   ep.get("file", ""), ep.get("runtime", 0), ep.get("tvshowid", -1))
+
+    @property
+    def directory(self):
+        return episode_paths.paths[self.path_id]
+
+    @property
+    def file(self):
+        return episode_paths.paths[self.path_id] + self.filename
+
+def get_episodes_from_playlist(playlist_path, apply_order=True):
+    """Retrieve episodes from a Smart Playlist by parsing its rules and querying episode metadata.
+
+    With apply_order=False the playlist's sort order is not applied, for callers that only count episodes.
+    """
     episodes = []
     original_path = playlist_path
     addon_name = "script.smart.channels"  # Match your addon ID
@@ -206,7 +288,7 @@ def get_episodes_from_playlist(playlist_path):
                 if "result" in result and "episodes" in result["result"]:
                     show_episodes = result["result"]["episodes"]
                     xbmc.log(f"{addon_name}: Found {len(show_episodes)} episodes for show {value}", level=xbmc.LOGINFO)
-                    episodes.extend(show_episodes)
+                    episodes.extend(Episode.from_jsonrpc(ep) for ep in show_episodes)
                 else:
                     xbmc.log(f"{addon_name}: No episodes found for TV show {value}", level=xbmc.LOGWARNING)
 
@@ -216,12 +298,15 @@ def get_episodes_from_playlist(playlist_path):
 
         xbmc.log(f"{addon_name}: Total episodes found: {len(episodes)}", level=xbmc.LOGINFO)
         
+        if not apply_order:
+            return episodes
+
         # Apply sort order
         sort_order = root.find(".//order")
         sort_order = sort_order.text if sort_order is not None else "episode"
         xbmc.log(f"{addon_name}: Applying sort order: {sort_order}", level=xbmc.LOGDEBUG)
         if sort_order == "episode":
-            episodes.sort(key=lambda x: (x.get("showtitle", ""), x.get("season", 0), x.get("episode", 0)))
+            episodes.sort(key=lambda x: (x.showtitle, x.season, x.episode))
         elif sort_order == "random":
             random.shuffle(episodes)
 
@@ -236,6 +321,659 @@ def get_episodes_from_playlist(playlist_path):
 #settings_file = os.path.join(data_path, "settings.json")  # Define settings_file
 #channel_lock = threading.Lock()
 
+class CollisionIndex:
+    """Index of which channels air which episode file in each time window.
+
+    Keyed by (file id, window), where the file id is the file's idFile in the video library and
+    window counts window_seconds slots from the start of the schedule; every channel is assumed to
+    start at the same time. Each channel's airings are kept in their own file under collision_dir,
+    so a rebuild only rewrites its own channel's file and other channels are never recomputed.
+    """
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self.slots = {}  # (file id, window) -> set of channel numbers
+
+    @staticmethod
+    def channel_file(channel_number):
+        return os.path.join(collision_dir, f"channel_{channel_number}.json")
+
+    @classmethod
+    def load(cls, window_seconds, exclude=None):
+        """Load the airings of every channel except exclude. Files written with another window size are ignored."""
+        index = cls(window_seconds)
+        if not xbmcvfs.exists(collision_dir):
+            return index
+        dirs, files = xbmcvfs.listdir(collision_dir)
+        for name in files:
+            if not name.startswith("channel_") or not name.endswith(".json"):
+                continue
+            channel_number = name[len("channel_"):-len(".json")]
+            if channel_number == exclude:
+                continue
+            data = read_json_file(os.path.join(collision_dir, name))
+            if not data or data.get("window_seconds") != window_seconds:
+                continue
+            # Flat list of file id, first window, last window per airing
+            ranges = data["ranges"]
+            for i in range(0, len(ranges), 3):
+                file_id, first_window, last_window = ranges[i:i + 3]
+                for window in range(first_window, last_window + 1):
+                    index.slots.setdefault((file_id, window), set()).add(channel_number)
+        return index
+
+    def windows(self, start, duration):
+        return range(start // self.window_seconds, (start + max(duration, 1) - 1) // self.window_seconds + 1)
+
+    def airs_elsewhere(self, file_id, start, duration):
+        """True if a loaded channel airs file_id in any window overlapping [start, start + duration)."""
+        for window in self.windows(start, duration):
+            if (file_id, window) in self.slots:
+                return True
+        return False
+
+    def save_channel(self, channel_number, airings):
+        """Write a channel's airings, an iterable of (file id, start, duration), to its own file."""
+        ranges = []
+        for file_id, start, duration in airings:
+            windows = self.windows(start, duration)
+            ranges.extend((file_id, windows.start, windows.stop - 1))
+        if not xbmcvfs.exists(collision_dir):
+            xbmcvfs.mkdirs(collision_dir)
+        data = {"window_seconds": self.window_seconds, "ranges": ranges}
+        return atomic_write(self.channel_file(channel_number), json.dumps(data, separators=(",", ":")))
+
+class CancelToken:
+    """Cancellation flag for a channel build, checked between build stages and playlists.
+
+    Besides cancel(), a build stops when Kodi is shutting down or when the Cancel Channel Builds
+    action (which runs as a separate script invocation) stamps the shared window property with a time
+    later than the token's creation. The property is never cleared, so a cancel request reaches builds
+    queued before it in every script instance but not builds queued after it.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._monitor = xbmc.Monitor()
+        self._created = time.time()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self):
+        if not self._event.is_set():
+            if self._monitor.abortRequested() or self._created < cancel_requested_at():
+                self._event.set()
+        return self._event.is_set()
+
+class BuildProgress:
+    """Progress display for a channel build: a modal dialog or a background progress bar.
+
+    Updates are rate-limited to PROGRESS_UPDATE_INTERVAL seconds so large builds don't flood the GUI.
+    """
+    def __init__(self, heading, message, background=False, report=True):
+        self.heading = heading
+        self.background = background
+        self.report = report
+        self._last_update = 0.0
+        self.dialog = xbmcgui.DialogProgressBG() if background else xbmcgui.DialogProgress()
+        self.dialog.create(heading, message)
+
+    def update(self, percent, message):
+        now = time.monotonic()
+        if now - self._last_update < PROGRESS_UPDATE_INTERVAL:
+            return
+        self._last_update = now
+        if self.background:
+            self.dialog.update(percent, self.heading, message)
+        else:
+            self.dialog.update(percent, message)
+
+    def to_background(self, message):
+        """Swap a modal dialog for a background progress bar, e.g. once the channel is already playable."""
+        if self.background:
+            return
+        self.dialog.close()
+        self.background = True
+        self.dialog = xbmcgui.DialogProgressBG()
+        self.dialog.create(self.heading, message)
+
+    def iscanceled(self):
+        # The background progress bar has no cancel button; use the Cancel Channel Builds action
+        return not self.background and self.dialog.iscanceled()
+
+    def finish(self, message):
+        """Close the progress display and report the build result, unless reporting is left to the caller."""
+        self.dialog.close()
+        if not self.report:
+            xbmc.log(f"{addon_name}: {message}", level=xbmc.LOGINFO)
+        elif self.background:
+            xbmcgui.Dialog().notification(addon_name, message)
+        else:
+            xbmcgui.Dialog().ok(addon_name, message)
+
+class BuildJob:
+    """A queued channel build with its cancellation token, completion event and result.
+
+    force and assemble are passed to generate_m3u; report=False leaves the result message to the caller.
+    """
+    def __init__(self, channel_number, playlist_paths, background=False, force=False, assemble=True, report=True):
+        self.channel_number = channel_number
+        self.playlist_paths = playlist_paths
+        self.background = background
+        self.force = force
+        self.assemble = assemble
+        self.report = report
+        self.token = CancelToken()
+        self.playable = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+
+class ChannelBuildQueue:
+    """Runs channel builds one at a time on a background worker thread."""
+    def __init__(self):
+        self._jobs = deque()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, job):
+        with self._lock:
+            self._jobs.append(job)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"{addon_id}.builds")
+                self._worker.start()
+        xbmc.log(f"{addon_name}: Queued build for channel {job.channel_number}", level=xbmc.LOGINFO)
+        return job
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._jobs:
+                    # Builds may have followed playlist or library changes; recount once nothing else runs.
+                    # Submitted before the worker is cleared so wait() callers also see the refresh.
+                    playlist_stats_refresher.submit(list_smart_playlists())
+                    self._worker = None
+                    return
+                job = self._jobs.popleft()
+            try:
+                if job.token.is_cancelled():
+                    xbmc.log(f"{addon_name}: Build for channel {job.channel_number} cancelled before it started", level=xbmc.LOGINFO)
+                    job.result = False
+                else:
+                    progress = BuildProgress(addon_name, f"Creating Channel {job.channel_number}, Please wait...", job.background, job.report)
+                    job.result = generate_m3u(job.channel_number, job.playlist_paths, progress=progress, cancel_token=job.token,
+                                              force=job.force, assemble=job.assemble, playable=job.playable)
+            except Exception as e:
+                xbmc.log(f"{addon_name}: Build for channel {job.channel_number} failed: {str(e)}", level=xbmc.LOGERROR)
+                job.result = False
+            finally:
+                job.done.set()
+
+    def is_idle(self):
+        with self._lock:
+            return self._worker is None
+
+    def wait(self):
+        """Block until every queued build has finished."""
+        while True:
+            with self._lock:
+                worker = self._worker
+            if worker is None:
+                return
+            worker.join()
+
+build_queue = ChannelBuildQueue()
+
+def build_channel(channel_number, playlist_paths, force=False):
+    """Queue a channel build. Returns its result, or None if it runs in the background or was cancelled."""
+    background = load_settings().get("build_progress_mode", "dialog") == "background"
+    job = build_queue.submit(BuildJob(channel_number, playlist_paths, background, force))
+    if background:
+        return None
+    # Return once the channel can be played; a progressive build finishes in the background
+    while not job.done.wait(0.1):
+        if job.playable.is_set():
+            return True
+    if not job.result and job.token.is_cancelled():
+        return None
+    return job.result
+
+def rebuild_all_channels(force=None):
+    """Rebuild every channel with playlists, skipping channels whose inputs are unchanged unless forced."""
+    dialog = xbmcgui.Dialog()
+    channels = [ch for ch in load_channels() if ch["playlists"]]
+    if not channels:
+        dialog.ok(addon_name, addon.getLocalizedString(32007))  # No Channels Created
+        return
+    if force is None:
+        force = dialog.yesno(addon_name, "Force a full rebuild of every channel, even if nothing changed?")
+
+    settings = load_settings()
+    background = settings.get("build_progress_mode", "dialog") == "background"
+    lineup = settings.get("m3u_output_mode", "channels") == "lineup"
+    jobs = [build_queue.submit(BuildJob(ch["number"], ch["playlists"], background, force, assemble=not lineup, report=False))
+            for ch in channels]
+
+    def summarize():
+        for job in jobs:
+            job.done.wait()
+        # The combined lineup is assembled once, after every section has been written
+        if lineup:
+            assemble_lineup()
+        cancelled = [job.channel_number for job in jobs if not job.result and job.token.is_cancelled()]
+        failed = [job.channel_number for job in jobs if not job.result and job.channel_number not in cancelled]
+        message = f"{len(jobs) - len(failed) - len(cancelled)} of {len(jobs)} channels up to date."
+        if failed:
+            message += f" Failed: {', '.join(failed)}"
+        if cancelled:
+            message += f" Cancelled: {', '.join(cancelled)}"
+        xbmc.log(f"{addon_name}: {message}", level=xbmc.LOGINFO)
+        if background:
+            xbmcgui.Dialog().notification(addon_name, message)
+        else:
+            xbmcgui.Dialog().ok(addon_name, message)
+
+    if background:
+        threading.Thread(target=summarize, name=f"{addon_id}.rebuild_all").start()
+    else:
+        summarize()
+
+def cancel_requested_at():
+    """Return the time of the last Cancel Channel Builds request, or 0 if there has been none."""
+    try:
+        return float(xbmcgui.Window(10000).getProperty(BUILD_CANCEL_PROPERTY) or 0)
+    except ValueError:
+        return 0
+
+def cancel_builds():
+    """Ask running and queued channel builds, in any script instance, to stop."""
+    xbmcgui.Window(10000).setProperty(BUILD_CANCEL_PROPERTY, str(time.time()))
+    xbmc.log(f"{addon_name}: Requested cancellation of channel builds", level=xbmc.LOGINFO)
+    xbmcgui.Dialog().notification(addon_name, "Cancelling channel builds...")
+
+def read_json_file(path):
+    """Read a JSON file through xbmcvfs. Returns None if it is missing or unreadable."""
+    try:
+        if not xbmcvfs.exists(path):
+            return None
+        with xbmcvfs.File(path) as f:
+            return json.load(f)
+    except Exception as e:
+        xbmc.log(f"{addon_name}: Error reading {path}: {str(e)}", level=xbmc.LOGWARNING)
+        return None
+
+def atomic_write(path, content):
+    """Write content to path through a temporary file so readers never see a half-written file.
+
+    content is a string or an iterable of strings; iterables are streamed to local files as they are produced.
+    """
+    real_path = xbmcvfs.translatePath(path)
+    tmp_path = f"{real_path}.tmp"
+    try:
+        if "://" not in real_path:
+            # Local or mounted share: os.replace swaps the finished file in one step
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                if isinstance(content, str):
+                    f.write(content)
+                else:
+                    f.writelines(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, real_path)
+        else:
+            # VFS share (smb://, nfs://): readers may briefly find no file, but never a partial one
+            with xbmcvfs.File(tmp_path, "w") as f:
+                f.write(content if isinstance(content, str) else "".join(content))
+            if xbmcvfs.exists(real_path):
+                xbmcvfs.delete(real_path)
+            if not xbmcvfs.rename(tmp_path, real_path):
+                raise IOError(f"Rename of {tmp_path} failed")
+        return True
+    except Exception as e:
+        xbmc.log(f"{addon_name}: Atomic write failed for {real_path}: {str(e)}", level=xbmc.LOGERROR)
+        return False
+
+def get_shared_cache_config(settings):
+    """Return (mode, directory) for the shared schedule cache. Mode is "off" when not configured."""
+    mode = settings.get("shared_cache_mode", "off")
+    cache_dir = settings.get("shared_cache_path", "")
+    if mode not in SHARED_CACHE_MODES or mode == "off":
+        return "off", None
+    if not cache_dir:
+        xbmc.log(f"{addon_name}: Shared cache mode {mode} enabled without a shared folder, ignoring", level=xbmc.LOGWARNING)
+        return "off", None
+    return mode, cache_dir
+
+def shared_cache_key(channel, playlist_paths, max_entries):
+    """Hash of the inputs a shared schedule was built from, so clients only reuse matching schedules."""
+    key_data = {
+        "playlists": list(playlist_paths),
+        "rules": channel.get("rules", {"randomize_shows": False}),
+        "max_entries": max_entries
+    }
+    return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+def get_library_generation():
+    """Return a marker that changes when video files or their stream details are added or removed.
+
+    The database file's mtime is not used since it also changes with every playcount update.
+    """
+    db_path = xbmcvfs.translatePath("special://database/MyVideos131.db")
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(idFile), MAX(dateAdded), COUNT(*) FROM files")
+            files_marker = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*), SUM(iVideoDuration) FROM streamdetails")
+            streams_marker = cursor.fetchone()
+        finally:
+            conn.close()
+        return list(files_marker) + list(streams_marker)
+    except Exception as e:
+        xbmc.log(f"{addon_name}: Error reading library generation from {db_path}: {str(e)}", level=xbmc.LOGWARNING)
+        return None
+
+def playlist_content_hash(playlist_path):
+    """Return the SHA-1 of a playlist file's contents, or None if it cannot be read."""
+    try:
+        with xbmcvfs.File(playlist_path) as f:
+            return hashlib.sha1(f.read().encode("utf-8")).hexdigest()
+    except Exception:
+        return None
+
+def compute_build_fingerprint(channel, playlist_paths, settings, shared_file=None):
+    """Hash everything a channel build depends on.
+
+    That is the playlist contents, rules, limits, collision and shared cache settings and the library generation.
+    Clients also pass the channel's schedule file from the shared manifest, so a new generation is picked up.
+    """
+    fingerprint_data = {
+        "playlists": list(playlist_paths),
+        "playlist_hashes": [playlist_content_hash(playlist_path) for playlist_path in playlist_paths],
+        "rules": channel.get("rules", {"randomize_shows": False}),
+        "max_entries": int(settings.get("playlist_upper_limit", 50)),
+        "avoid_collisions": settings.get("avoid_collisions", False),
+        "collision_window": int(settings.get("collision_window", 30)),
+        "shared_cache": list(get_shared_cache_config(settings)),
+        "shared_file": shared_file,
+        "library": get_library_generation()
+    }
+    return hashlib.sha1(json.dumps(fingerprint_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+def load_channel_fingerprints():
+    """Return the fingerprints channels were last built from, keyed by channel number."""
+    return read_json_file(fingerprints_file) or {}
+
+def save_channel_fingerprint(channel_number, fingerprint):
+    """Record the fingerprint of the inputs a channel was last built from in fingerprints.json.
+
+    Kept out of channels.json so builds never rewrite the channel list while it is being edited.
+    A fingerprint of None forgets the channel.
+    """
+    with channel_lock:
+        fingerprints = load_channel_fingerprints()
+        if fingerprint is None:
+            if str(channel_number) not in fingerprints:
+                return
+            fingerprints.pop(str(channel_number))
+        else:
+            fingerprints[str(channel_number)] = fingerprint
+        atomic_write(fingerprints_file, json.dumps(fingerprints, indent=2))
+
+def format_m3u_entry(showtitle, season, episode_num, title, filepath, duration):
+    """Return the #EXTINF and path lines for one M3U entry."""
+    return [f"#EXTINF:{duration},{showtitle} S{season:02d}E{episode_num:02d} - {title}", filepath]
+
+def load_shared_manifest(cache_dir):
+    """Load the shared cache manifest. Returns None if missing, unreadable or of an unknown format."""
+    manifest = read_json_file(os.path.join(cache_dir, "manifest.json"))
+    if not manifest or manifest.get("format") != SHARED_CACHE_FORMAT:
+        return None
+    return manifest
+
+def prune_shared_schedules(cache_dir, channel_number, keep):
+    """Delete old generations of a channel's shared schedule, except the file names in keep."""
+    try:
+        dirs, files = xbmcvfs.listdir(cache_dir)
+    except Exception as e:
+        xbmc.log(f"{addon_name}: Error listing shared cache {cache_dir}: {str(e)}", level=xbmc.LOGWARNING)
+        return
+    prefix = f"channel_{channel_number}.g"
+    for name in files:
+        if name.startswith(prefix) and name.endswith(".json") and name not in keep:
+            try:
+                xbmcvfs.delete(os.path.join(cache_dir, name))
+                xbmc.log(f"{addon_name}: Pruned shared schedule {name}", level=xbmc.LOGDEBUG)
+            except Exception as e:
+                xbmc.log(f"{addon_name}: Error pruning shared schedule {name}: {str(e)}", level=xbmc.LOGWARNING)
+
+def publish_shared_schedule(cache_dir, channel_number, key, schedule):
+    """Publish a channel's resolved episodes and schedule to the shared cache as a new generation.
+
+    The schedule file is written under a generation-stamped name before the manifest is swapped to
+    point at it, so clients following the manifest only ever open complete files. The previous
+    generation is kept for clients that are still reading it.
+    """
+    with channel_lock:
+        manifest = load_shared_manifest(cache_dir) or {"format": SHARED_CACHE_FORMAT, "generation": 0, "channels": {}}
+        generation = manifest["generation"] + 1
+
+        # Resolved episode snapshot, one row per episode; the schedule stores row indices
+        shows = schedule.shows
+        episode_rows = []
+        for show_idx, show in enumerate(shows):
+            for ep in show["episodes"]:
+                episode_rows.append([show_idx, ep.season, ep.episode, ep.title, ep.file, ep.runtime])
+        data = {
+            "format": SHARED_CACHE_FORMAT,
+            "generation": generation,
+            "channel": str(channel_number),
+            "key": key,
+            "shows": [show["showtitle"] for show in shows],
+            "episodes": episode_rows,
+            "schedule": schedule.rows()[0].tolist()
+        }
+        file_name = f"channel_{channel_number}.g{generation}.json"
+        if not atomic_write(os.path.join(cache_dir, file_name), json.dumps(data, separators=(",", ":"))):
+            return False
+
+        previous = manifest["channels"].get(str(channel_number), {}).get("file")
+        manifest["generation"] = generation
+        manifest["updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        manifest["channels"][str(channel_number)] = {"file": file_name, "key": key, "entries": len(schedule)}
+        if not atomic_write(os.path.join(cache_dir, "manifest.json"), json.dumps(manifest, indent=2)):
+            return False
+
+        prune_shared_schedules(cache_dir, channel_number, keep=(file_name, previous))
+        xbmc.log(f"{addon_name}: Published channel {channel_number} to shared cache as generation {generation}", level=xbmc.LOGINFO)
+        return True
+
+def load_shared_schedule(cache_dir, channel_number, key, manifest=None):
+    """Return (file name, M3U lines) for a channel from the shared cache, or None if there is no matching schedule."""
+    manifest = manifest or load_shared_manifest(cache_dir)
+    if not manifest:
+        return None
+    entry = manifest["channels"].get(str(channel_number))
+    if not entry or entry.get("key") != key:
+        return None
+    data = read_json_file(os.path.join(cache_dir, entry["file"]))
+    if not data or data.get("format") != SHARED_CACHE_FORMAT or data.get("key") != key:
+        xbmc.log(f"{addon_name}: Shared schedule {entry['file']} unavailable for channel {channel_number}", level=xbmc.LOGWARNING)
+        return None
+
+    shows = data["shows"]
+    episode_rows = data["episodes"]
+    m3u_content = ["#EXTM3U"]
+    for row_idx in data["schedule"]:
+        show_idx, season, episode_num, title, filepath, duration = episode_rows[row_idx]
+        m3u_content.extend(format_m3u_entry(shows[show_idx], season, episode_num, title, filepath, duration))
+    xbmc.log(f"{addon_name}: Loaded channel {channel_number} from shared cache generation {data['generation']}", level=xbmc.LOGINFO)
+    return entry["file"], m3u_content
+
+def write_m3u_file(m3u_path, m3u_content):
+    """Write M3U lines to m3u_path, atomically replacing any existing file. Returns True on success."""
+    xbmc.log(f"{addon_name}: Attempting to write M3U file to {m3u_path}", level=xbmc.LOGINFO)
+    try:
+        # Ensure directory exists
+        m3u_dir = os.path.dirname(m3u_path)
+        if not xbmcvfs.exists(m3u_dir):
+            xbmcvfs.mkdirs(m3u_dir)
+            xbmc.log(f"{addon_name}: Created directory {m3u_dir}", level=xbmc.LOGINFO)
+
+        # Players reading the old file keep seeing it until the new one is complete
+        if not atomic_write(m3u_path, "\n".join(m3u_content)):
+            return False
+        xbmc.log(f"{addon_name}: Successfully wrote M3U file to {m3u_path} with {(len(m3u_content) - 1) // 2} entries", level=xbmc.LOGINFO)
+
+        # Verify file exists
+        if xbmcvfs.exists(m3u_path):
+            xbmc.log(f"{addon_name}: Confirmed M3U file exists at {m3u_path}", level=xbmc.LOGINFO)
+            return True
+        xbmc.log(f"{addon_name}: M3U file not found at {m3u_path} after writing", level=xbmc.LOGERROR)
+        return False
+    except Exception as e:
+        xbmc.log(f"{addon_name}: General error writing M3U file {m3u_path}: {str(e)}", level=xbmc.LOGERROR)
+        return False
+
+def get_channel_output_path(channel_number, settings):
+    """Return the file holding a channel's entries: its own M3U, or its section of the combined lineup."""
+    if settings.get("m3u_output_mode", "channels") == "lineup":
+        return os.path.join(lineup_dir, f"channel_{channel_number}.section")
+    return os.path.join(data_path, f"channel_{channel_number}.m3u")
+
+def assemble_lineup():
+    """Stream every channel's section, in channel order, into the combined lineup M3U in one pass.
+
+    Sections hold plain entries; the tvg attributes are added here so renumbering or renaming a
+    channel only needs the lineup reassembled, not the channel rebuilt.
+    """
+    channels = load_channels()
+
+    def lineup_lines():
+        yield "#EXTM3U"
+        for channel in channels:
+            section_path = os.path.join(lineup_dir, f"channel_{channel['number']}.section")
+            if not xbmcvfs.exists(section_path):
+                continue
+            name = channel["name"].replace('"', "'")
+            attributes = f'tvg-id="{addon_id}.{channel["number"]}" tvg-chno="{channel["number"]}" tvg-name="{name}"'
+            with open(xbmcvfs.translatePath(section_path), "r", encoding="utf-8") as section:
+                for line in section:
+                    line = line.rstrip("\n")
+                    if line.startswith("#EXTINF:"):
+                        duration, _, label = line[len("#EXTINF:"):].partition(",")
+                        line = f"#EXTINF:{duration} {attributes},{label}"
+                    yield "\n" + line
+
+    if atomic_write(lineup_file, lineup_lines()):
+        xbmc.log(f"{addon_name}: Assembled lineup {lineup_file} from {len(channels)} channels", level=xbmc.LOGINFO)
+        return True
+    return False
+
+def write_channel_output(channel_number, m3u_content, settings, assemble=True):
+    """Write a channel's M3U lines to its own file, or to its lineup section followed by a lineup rebuild.
+
+    Pass assemble=False when writing several channels and call assemble_lineup() once afterwards.
+    """
+    if settings.get("m3u_output_mode", "channels") != "lineup":
+        return write_m3u_file(get_channel_output_path(channel_number, settings), m3u_content)
+    if not xbmcvfs.exists(lineup_dir):
+        xbmcvfs.mkdirs(lineup_dir)
+    # Only this channel's section is regenerated; the others are copied as-is when assembling
+    if not atomic_write(get_channel_output_path(channel_number, settings), "\n".join(m3u_content[1:])):
+        return False
+    xbmc.log(f"{addon_name}: Wrote lineup section for channel {channel_number} with {(len(m3u_content) - 1) // 2} entries", level=xbmc.LOGINFO)
+    return assemble_lineup() if assemble else True
+
+def rename_channel_output(old_number, new_number):
+    """Move a channel's M3U file or lineup section and collision file to a new channel number. Returns True on success.
+
+    If a file cannot be moved, the lineup and fingerprint are left untouched.
+    """
+    for directory, suffix in ((data_path, "m3u"), (lineup_dir, "section"), (collision_dir, "json")):
+        old_path = os.path.join(directory, f"channel_{old_number}.{suffix}")
+        if xbmcvfs.exists(old_path):
+            new_path = os.path.join(directory, f"channel_{new_number}.{suffix}")
+            try:
+                if not xbmcvfs.rename(old_path, new_path):
+                    xbmc.log(f"{addon_name}: Failed to rename {old_path} to {new_path}", level=xbmc.LOGERROR)
+                    return False
+            except Exception as e:
+                xbmc.log(f"{addon_name}: Error renaming {old_path}: {str(e)}", level=xbmc.LOGERROR)
+                return False
+    if xbmcvfs.exists(lineup_file):
+        assemble_lineup()
+    fingerprint = load_channel_fingerprints().get(str(old_number))
+    save_channel_fingerprint(old_number, None)
+    if fingerprint:
+        save_channel_fingerprint(new_number, fingerprint)
+    return True
+
+def remove_channel_outputs(channel_numbers):
+    """Delete the M3U files, lineup sections and collision files of the given channels, listing each folder once."""
+    for directory, suffix in ((data_path, "m3u"), (lineup_dir, "section"), (collision_dir, "json")):
+        if not xbmcvfs.exists(directory):
+            continue
+        wanted = {f"channel_{number}.{suffix}" for number in channel_numbers}
+        dirs, files = xbmcvfs.listdir(directory)
+        for name in files:
+            if name not in wanted:
+                continue
+            file_path = os.path.join(directory, name)
+            try:
+                xbmcvfs.delete(file_path)
+                xbmc.log(f"{addon_name}: Deleted {file_path}", level=xbmc.LOGINFO)
+            except Exception as e:
+                xbmc.log(f"{addon_name}: Failed to delete {file_path}: {str(e)}", level=xbmc.LOGERROR)
+    if xbmcvfs.exists(lineup_file):
+        assemble_lineup()
+    for channel_number in channel_numbers:
+        save_channel_fingerprint(channel_number, None)
+
+def sync_shared_cache():
+    """Refresh local channel M3U files from the shared cache if the builder published a new generation."""
+    dialog = xbmcgui.Dialog()
+    settings = load_settings()
+    cache_mode, cache_dir = get_shared_cache_config(settings)
+    if cache_mode != "client":
+        dialog.ok(addon_name, "Shared cache sync is only available in client mode.")
+        return
+
+    manifest = load_shared_manifest(cache_dir)
+    if not manifest:
+        xbmc.log(f"{addon_name}: No shared cache manifest in {cache_dir}", level=xbmc.LOGWARNING)
+        dialog.notification(addon_name, "No shared cache found.")
+        return
+    state = read_json_file(shared_state_file) or {"generation": 0, "channels": {}}
+    if manifest["generation"] == state.get("generation"):
+        xbmc.log(f"{addon_name}: Shared cache generation {manifest['generation']} already synced", level=xbmc.LOGINFO)
+        dialog.notification(addon_name, "Channels are up to date.")
+        return
+
+    max_entries = int(settings.get("playlist_upper_limit", 50))
+    updated = 0
+    for channel in load_channels():
+        channel_number = channel["number"]
+        entry = manifest["channels"].get(channel_number)
+        if not entry or not channel["playlists"]:
+            continue
+        if state["channels"].get(channel_number) == entry["file"] and xbmcvfs.exists(get_channel_output_path(channel_number, settings)):
+            continue
+        key = shared_cache_key(channel, channel["playlists"], max_entries)
+        shared = load_shared_schedule(cache_dir, channel_number, key, manifest)
+        if shared is None:
+            continue
+        file_name, m3u_content = shared
+        if write_channel_output(channel_number, m3u_content, settings, assemble=False):
+            state["channels"][channel_number] = file_name
+            updated += 1
+
+    if updated and settings.get("m3u_output_mode", "channels") == "lineup":
+        assemble_lineup()
+    state["generation"] = manifest["generation"]
+    atomic_write(shared_state_file, json.dumps(state, indent=2))
+    xbmc.log(f"{addon_name}: Synced {updated} channels from shared cache generation {manifest['generation']}", level=xbmc.LOGINFO)
+    dialog.notification(addon_name, f"Updated {updated} channels from shared cache.")
+
 def load_settings():
     """Load settings from settings.json. Returns dict with defaults on failure."""
     try:
@@ -247,11 +985,246 @@ def load_settings():
         xbmc.log(f"{addon_name}: Failed to load settings: {str(e)}", level=xbmc.LOGERROR)
         return {"playlist_upper_limit": 50}
 
-def generate_m3u(channel_number, playlist_paths):
-    """Generate M3U file with continuous round-robin episodic order, randomizing show order per round and cycling episodes."""
+def lookup_episode_duration(cursor, ep):
+    """Return an episode's video duration in seconds from MyVideos131.db, or 0 if none is stored.
+
+    Also records the episode's idFile as ep.file_id.
+    """
+    cursor.execute("""
+        SELECT idFile, (
+            SELECT iVideoDuration
+            FROM streamdetails
+            WHERE streamdetails.idFile = files.idFile
+        )
+        FROM files
+        WHERE strFileName = ? AND idPath = (
+            SELECT idPath
+            FROM path
+            WHERE strPath = ?
+        )
+    """, (ep.filename, ep.directory))
+    result = cursor.fetchone()
+    if not result:
+        return 0
+    ep.file_id = result[0]
+    return result[1] or 0
+
+def resolve_show_episodes(cursor, show, channel_number, skipped_files, needed=None):
+    """Look up durations for a show's pending episodes until it has `needed` playable ones (all of them when None).
+
+    Episodes without a duration, or whose lookup fails, are dropped and recorded in skipped_files.
+    """
+    pending = show["pending"]
+    while pending and (needed is None or len(show["episodes"]) < needed):
+        ep = pending.popleft()
+        file_path = ep.file
+        try:
+            duration = lookup_episode_duration(cursor, ep)
+            reason = None if duration else "Zero duration in database"
+            if duration:
+                xbmc.log(f"{addon_name}: Found duration {duration}s for {file_path}", level=xbmc.LOGDEBUG)
+            else:
+                xbmc.log(f"{addon_name}: No duration found for {file_path}, skipping due to zero duration", level=xbmc.LOGWARNING)
+        except Exception as e:
+            xbmc.log(f"{addon_name}: Error querying duration for {file_path}: {str(e)}", level=xbmc.LOGERROR)
+            reason = "Database query error"
+        if reason:
+            skipped_files.append({
+                "channel": str(channel_number),
+                "file_path": file_path,
+                "showtitle": ep.showtitle,
+                "season": ep.season,
+                "episode": ep.episode,
+                "title": ep.title,
+                "reason": reason,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+            continue
+        ep.runtime = duration
+        show["episodes"].append(ep)
+
+class Schedule:
+    """A planned channel schedule held as parallel integer arrays, one slot per entry.
+
+    show_order and episode_order index into the shows the schedule was planned over and start_times holds
+    each entry's offset in seconds from the start of the channel. Text is only produced when it is written out.
+    """
+    __slots__ = ("shows", "show_order", "episode_order", "start_times")
+
+    def __init__(self, shows, show_order=None, episode_order=None, start_times=None):
+        self.shows = shows
+        self.show_order = show_order if show_order is not None else array("i")
+        self.episode_order = episode_order if episode_order is not None else array("i")
+        self.start_times = start_times if start_times is not None else array("q")
+
+    def __len__(self):
+        return len(self.show_order)
+
+    def rows(self):
+        """Return (rows, total), numbering the shows' episodes consecutively and giving each entry's row."""
+        first_rows = array("i")
+        total = 0
+        for show in self.shows:
+            first_rows.append(total)
+            total += len(show["episodes"])
+        rows = array("i", (first_rows[show_idx] + episode_idx for show_idx, episode_idx in zip(self.show_order, self.episode_order)))
+        return rows, total
+
+    def airings(self):
+        """Yield (file id, start, duration) per entry, as used by the collision index."""
+        for show_idx, episode_idx, start in zip(self.show_order, self.episode_order, self.start_times):
+            episode = self.shows[show_idx]["episodes"][episode_idx]
+            yield episode.file_id, start, episode.runtime
+
+    def to_m3u(self):
+        """Format the schedule as M3U lines, formatting each distinct episode once however often it airs."""
+        rows, total = self.rows()
+        entries = [None] * total
+        episodes = [(show["showtitle"], ep) for show in self.shows for ep in show["episodes"]]
+        for row in set(rows):
+            showtitle, ep = episodes[row]
+            entries[row] = format_m3u_entry(showtitle, ep.season, ep.episode, ep.title, ep.file, ep.runtime)
+        m3u_content = ["#EXTM3U"]
+        for row in rows:
+            m3u_content.extend(entries[row])
+        return m3u_content
+
+def plan_round_robin(shows, max_entries, rules, channel_number, collision_index=None, build_cancelled=None, progress=None):
+    """Plan a round-robin schedule over shows, randomizing or sorting the show order each round and cycling episodes.
+
+    Returns (schedule, expected_show_orders), or None if the build was cancelled. Without a collision index
+    every show airs exactly once per round, so the schedule is computed directly as arrays and
+    expected_show_orders is None; collision avoidance needs the entry-by-entry planner.
+    """
+    if collision_index is not None or not all(show["episodes"] for show in shows):
+        return plan_round_robin_entries(shows, max_entries, rules, channel_number, collision_index, build_cancelled, progress)
+
+    schedule = Schedule(shows)
+    show_count = len(shows)
+    if not show_count or max_entries <= 0:
+        return schedule, None
+    rounds = -(-max_entries // show_count)
+
+    # Show order for every round; the seeds match the entry-by-entry planner
+    if rules["randomize_shows"]:
+        rng = random.Random()  # Not the module RNG, which other threads may use between seed and shuffle
+        for round_idx in range(rounds):
+            if build_cancelled is not None and round_idx % 100 == 0 and build_cancelled():
+                return None
+            round_order = list(range(show_count))
+            rng.seed(42 + round_idx * show_count)
+            rng.shuffle(round_order)
+            schedule.show_order.extend(round_order)
+    else:
+        schedule.show_order = array("i", sorted(range(show_count), key=lambda i: shows[i]["showtitle"])) * rounds
+    del schedule.show_order[max_entries:]
+
+    # Each show airs once per round, so its episode cursor is the round number
+    episode_counts = [len(show["episodes"]) for show in shows]
+    schedule.episode_order = array("i", ((entry // show_count) % episode_counts[show_idx]
+                                         for entry, show_idx in enumerate(schedule.show_order)))
+    runtimes = [[ep.runtime for ep in show["episodes"]] for show in shows]
+    durations = (runtimes[show_idx][episode_idx] for show_idx, episode_idx in zip(schedule.show_order, schedule.episode_order))
+    schedule.start_times = array("q", accumulate(durations, initial=0))
+    schedule.start_times.pop()
+
+    xbmc.log(f"{addon_name}: Planned {len(schedule)} entries over {rounds} rounds of {show_count} shows for channel {channel_number}", level=xbmc.LOGINFO)
+    return schedule, None
+
+def plan_round_robin_entries(shows, max_entries, rules, channel_number, collision_index=None, build_cancelled=None, progress=None):
+    """Plan a round-robin schedule one entry at a time, skipping episodes that collide with other channels.
+
+    Returns (schedule, expected_show_orders), or None if the build was cancelled.
+    """
+    schedule = Schedule(shows)
+    rng = random.Random()  # Not the module RNG, which other threads may use between seed and shuffle
+    expected_show_orders = []  # Track show order per round for validation
+    episode_indices = [0] * len(shows)  # Track episode index per show
+    show_positions = {show["showtitle"]: i for i, show in enumerate(shows)}
+    start_time = 0  # Seconds from the start of the schedule
+    entry_count = 0
+
+    # Round-robin through shows, randomizing order each round
+    round_num = 0
+    while entry_count < max_entries:
+        if build_cancelled is not None and build_cancelled():
+            return None
+        round_num += 1
+        # Use all shows, as episodes will cycle
+        round_shows = shows.copy()
+        if not round_shows:
+            xbmc.log(f"{addon_name}: No shows available for channel {channel_number}, stopping at {entry_count} entries", level=xbmc.LOGINFO)
+            break
+
+        if rules["randomize_shows"]:
+            rng.seed(42 + entry_count)  # Unique seed per round for testing
+            rng.shuffle(round_shows)
+            round_order = [show["showtitle"] for show in round_shows]
+            xbmc.log(f"{addon_name}: Round {round_num} show order for channel {channel_number}: {round_order}", level=xbmc.LOGINFO)
+        else:
+            round_shows.sort(key=lambda x: x["showtitle"])
+            round_order = [show["showtitle"] for show in round_shows]
+            xbmc.log(f"{addon_name}: Round {round_num} sorted show order for channel {channel_number}: {round_order}", level=xbmc.LOGINFO)
+        expected_show_orders.append(round_order)
+
+        # Process one episode from each show in this round's order
+        if progress is not None:
+            progress.update(int(entry_count / max_entries * 100), f"Building M3U: Round {round_num}, {entry_count}/{max_entries} entries")
+        for show in round_shows:
+            show_idx = show_positions[show["showtitle"]]
+            episodes = show["episodes"]
+            if not episodes:  # Skip empty shows
+                continue
+            # Cycle episode index using modulo
+            episode_idx = episode_indices[show_idx] % len(episodes)
+            if collision_index is not None:
+                # Skip ahead past episodes another channel airs in the same time window
+                for skip in range(min(len(episodes), COLLISION_LOOKAHEAD)):
+                    candidate_idx = (episode_indices[show_idx] + skip) % len(episodes)
+                    candidate = episodes[candidate_idx]
+                    if not collision_index.airs_elsewhere(candidate.file_id, start_time, candidate.runtime):
+                        if skip:
+                            xbmc.log(f"{addon_name}: Skipped {skip} colliding episode(s) of {show['showtitle']} at {start_time}s on channel {channel_number}", level=xbmc.LOGDEBUG)
+                        episode_indices[show_idx] += skip
+                        episode_idx = candidate_idx
+                        break
+            episode = episodes[episode_idx]
+            schedule.show_order.append(show_idx)
+            schedule.episode_order.append(episode_idx)
+            schedule.start_times.append(start_time)
+            start_time += episode.runtime
+            xbmc.log(f"{addon_name}: Added to M3U: {show['showtitle']} S{episode.season:02d}E{episode.episode:02d} - {episode.title} (duration: {episode.runtime}s)", level=xbmc.LOGDEBUG)
+            episode_indices[show_idx] += 1
+            entry_count += 1
+            if entry_count >= max_entries:
+                xbmc.log(f"{addon_name}: Reached max_entries {max_entries} for channel {channel_number}", level=xbmc.LOGINFO)
+                break
+
+    return schedule, expected_show_orders
+
+def generate_m3u(channel_number, playlist_paths, progress=None, cancel_token=None, force=False, assemble=True, playable=None):
+    """Generate M3U file with continuous round-robin episodic order, randomizing show order per round and cycling episodes.
+
+    Normally run from build_queue via build_channel(); cancel_token is checked between stages and playlists.
+    Unless force is set, the build returns straight away when the channel's input fingerprint is unchanged.
+    assemble=False leaves rebuilding the combined lineup to the caller. With progressive builds enabled, a short
+    head of the schedule is written first and the playable event is set once it can be played.
+    """
+    build_started = time.monotonic()
     # Show "Creating Channel" dialog
-    progress_dialog = xbmcgui.DialogProgress()
-    progress_dialog.create(addon_name, f"Creating Channel {channel_number}, Please wait...")
+    if progress is None:
+        progress = BuildProgress(addon_name, f"Creating Channel {channel_number}, Please wait...")
+    if cancel_token is None:
+        cancel_token = CancelToken()
+
+    def build_cancelled():
+        if progress.iscanceled():
+            cancel_token.cancel()
+        if cancel_token.is_cancelled():
+            xbmc.log(f"{addon_name}: Build for channel {channel_number} cancelled", level=xbmc.LOGINFO)
+            progress.finish(f"Channel {channel_number} build cancelled.")
+            return True
+        return False
 
     settings = load_settings()
     max_entries = int(settings.get("playlist_upper_limit", 50))
@@ -262,20 +1235,49 @@ def generate_m3u(channel_number, playlist_paths):
     channel = next((ch for ch in channels if ch["number"] == channel_number), None)
     if not channel:
         xbmc.log(f"{addon_name}: Channel {channel_number} not found in channels.json", level=xbmc.LOGERROR)
-        progress_dialog.close()
-        xbmcgui.Dialog().ok(addon_name, f"Channel {channel_number} not found.")
+        progress.finish(f"Channel {channel_number} not found.")
         return False
     rules = channel.get("rules", {"randomize_shows": False})
     xbmc.log(f"{addon_name}: Rules for channel {channel_number}: {rules}", level=xbmc.LOGINFO)
 
     if not playlist_paths:
         xbmc.log(f"{addon_name}: No playlists for channel {channel_number}, skipping M3U generation", level=xbmc.LOGINFO)
-        progress_dialog.close()
-        xbmcgui.Dialog().ok(addon_name, f"No playlists for Channel {channel_number}.")
+        progress.finish(f"No playlists for Channel {channel_number}.")
         return True
 
-    m3u_content = ["#EXTM3U"]
+    # Clients read the shared manifest first: a newly published generation counts as a changed input
+    cache_mode, cache_dir = get_shared_cache_config(settings)
+    cache_key = shared_cache_key(channel, playlist_paths, max_entries)
+    manifest = None
+    shared_file = None
+    if cache_mode == "client":
+        manifest = load_shared_manifest(cache_dir)
+        if manifest is not None:
+            shared_file = manifest["channels"].get(str(channel_number), {}).get("file")
+
+    # Skip the build when nothing it depends on has changed since the last one
+    fingerprint = compute_build_fingerprint(channel, playlist_paths, settings, shared_file)
+    if not force and load_channel_fingerprints().get(str(channel_number)) == fingerprint and xbmcvfs.exists(get_channel_output_path(channel_number, settings)):
+        xbmc.log(f"{addon_name}: Inputs for channel {channel_number} unchanged, skipping rebuild", level=xbmc.LOGINFO)
+        progress.finish(f"Channel {channel_number} is up to date.")
+        return True
+
+    # Reuse the builder's schedule from the shared cache when it was built from the same inputs
+    if cache_mode == "client":
+        shared = load_shared_schedule(cache_dir, channel_number, cache_key, manifest)
+        if shared is not None:
+            file_name, m3u_content = shared
+            if write_channel_output(channel_number, m3u_content, settings, assemble):
+                state = read_json_file(shared_state_file) or {"generation": 0, "channels": {}}
+                state["channels"][str(channel_number)] = file_name
+                atomic_write(shared_state_file, json.dumps(state, indent=2))
+                save_channel_fingerprint(channel_number, fingerprint)
+                progress.finish(f"Channel {channel_number} Creation Success")
+                return True
+        xbmc.log(f"{addon_name}: No shared schedule for channel {channel_number}, building locally", level=xbmc.LOGINFO)
+
     all_episodes = []
+    superseded_shows = []
     skipped_files = []
 
     # Connect to MyVideos131.db
@@ -285,80 +1287,86 @@ def generate_m3u(channel_number, playlist_paths):
         cursor = conn.cursor()
     except Exception as e:
         xbmc.log(f"{addon_name}: Error connecting to MyVideos131.db: {str(e)}", level=xbmc.LOGERROR)
-        progress_dialog.close()
-        xbmcgui.Dialog().ok(addon_name, "Failed to connect to database. Check kodi.log.")
+        progress.finish("Failed to connect to database. Check kodi.log.")
         return False
 
-    # Collect episodes from all playlists
+    # Collect episodes per playlist, grouped by show; durations are looked up per show below.
+    # The last playlist with episodes supplies the channel's shows.
     total_playlists = len(playlist_paths)
     for i, playlist_path in enumerate(playlist_paths):
-        progress_dialog.update(int(i / total_playlists * 100), f"Processing playlist {i + 1}/{total_playlists}...")
+        if build_cancelled():
+            conn.close()
+            return False
+        progress.update(int(i / total_playlists * 100), f"Processing playlist {i + 1}/{total_playlists}...")
         if not playlist_path.endswith(".xsp"):
             xbmc.log(f"{addon_name}: Skipping non-Smart Playlist {playlist_path}", level=xbmc.LOGWARNING)
             continue
         episodes = get_episodes_from_playlist(playlist_path)
         if episodes:
             shows = []
+            shows_by_title = {}
             for ep in episodes:
-                showtitle = ep.get("showtitle", "Unknown")
-                file_path = ep.get("file", "")
-                duration = 0
-                try:
-                    cursor.execute("""
-                        SELECT iVideoDuration
-                        FROM streamdetails
-                        WHERE idFile = (
-                            SELECT idFile
-                            FROM files
-                            WHERE strFileName = ? AND idPath = (
-                                SELECT idPath
-                                FROM path
-                                WHERE strPath = ?
-                            )
-                        )
-                    """, (os.path.basename(file_path), os.path.dirname(file_path) + "/"))
-                    result = cursor.fetchone()
-                    if result and result[0]:
-                        duration = result[0]
-                        xbmc.log(f"{addon_name}: Found duration {duration}s for {file_path}", level=xbmc.LOGDEBUG)
-                    else:
-                        duration = 0
-                        xbmc.log(f"{addon_name}: No duration found for {file_path}, skipping due to zero duration", level=xbmc.LOGWARNING)
-                        skipped_files.append({
-                            "channel": str(channel_number),
-                            "file_path": file_path,
-                            "showtitle": showtitle,
-                            "season": ep.get("season", 0),
-                            "episode": ep.get("episode", 0),
-                            "title": ep.get("title", "Unknown"),
-                            "reason": "Zero duration in database",
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        })
-                        continue
-                except Exception as e:
-                    xbmc.log(f"{addon_name}: Error querying duration for {file_path}: {str(e)}", level=xbmc.LOGERROR)
-                    skipped_files.append({
-                        "channel": str(channel_number),
-                        "file_path": file_path,
-                        "showtitle": showtitle,
-                        "season": ep.get("season", 0),
-                        "episode": ep.get("episode", 0),
-                        "title": ep.get("title", "Unknown"),
-                        "reason": "Database query error",
-                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    })
-                    continue
-                ep["runtime"] = duration
-                show_entry = next((s for s in shows if s["showtitle"] == showtitle), None)
+                show_entry = shows_by_title.get(ep.showtitle)
                 if not show_entry:
-                    show_entry = {"showtitle": showtitle, "episodes": []}
+                    show_entry = {"showtitle": ep.showtitle, "episodes": [], "pending": deque()}
                     shows.append(show_entry)
-                show_entry["episodes"].append(ep)
-            show_titles = [show["showtitle"] for show in shows]
-            xbmc.log(f"{addon_name}: Shows before processing for channel {channel_number}: {show_titles}", level=xbmc.LOGINFO)
+                    shows_by_title[ep.showtitle] = show_entry
+                show_entry["pending"].append(ep)
+            xbmc.log(f"{addon_name}: Shows before processing for channel {channel_number}: {[show['showtitle'] for show in shows]}", level=xbmc.LOGINFO)
+            superseded_shows.extend(all_episodes)
             all_episodes = shows
 
+    collision_index = None
+    if settings.get("avoid_collisions", False):
+        collision_index = CollisionIndex.load(int(settings.get("collision_window", 30)) * 60, exclude=str(channel_number))
+
+    # Progressive build: write a playable head first, using only the episodes it needs. A channel that
+    # already has output is playable as it is, so its file is not cut down to the head during a rebuild.
+    head_entries = int(settings.get("progressive_head_entries", 10))
+    time_to_playable = None
+    if (settings.get("progressive_build", False) and head_entries < max_entries and all_episodes
+            and not xbmcvfs.exists(get_channel_output_path(channel_number, settings))):
+        for show in all_episodes:
+            resolve_show_episodes(cursor, show, channel_number, skipped_files, needed=1)
+        head_shows = [show for show in all_episodes if show["episodes"]]
+        if head_shows:
+            # Each show airs at most once per round; collision skips can look further ahead
+            needed = -(-head_entries // len(head_shows))
+            if collision_index is not None:
+                needed *= COLLISION_LOOKAHEAD
+            for show in head_shows:
+                resolve_show_episodes(cursor, show, channel_number, skipped_files, needed=needed)
+            # Shows are either resolved past anything the head uses or fully resolved, so the head
+            # is an exact prefix of the full schedule
+            plan = plan_round_robin(head_shows, head_entries, rules, channel_number, collision_index)
+            # A build that stops after the head must not leave it looking up to date
+            save_channel_fingerprint(channel_number, None)
+            if plan and plan[0] and write_channel_output(channel_number, plan[0].to_m3u(), settings, assemble):
+                time_to_playable = time.monotonic() - build_started
+                xbmc.log(f"{addon_name}: Build stats for channel {channel_number}: first {len(plan[0])} entries playable after {time_to_playable:.2f}s", level=xbmc.LOGINFO)
+                if playable is not None:
+                    playable.set()
+                progress.to_background(f"Channel {channel_number} is playable, finishing in background...")
+
+    # Earlier playlists' episodes are still checked so their skipped files are logged
+    for show in superseded_shows:
+        if build_cancelled():
+            conn.close()
+            return False
+        resolve_show_episodes(cursor, show, channel_number, skipped_files)
+
+    # Resolve the remaining durations
+    for i, show in enumerate(all_episodes):
+        if build_cancelled():
+            conn.close()
+            return False
+        progress.update(int(i / len(all_episodes) * 100), f"Looking up durations: {show['showtitle']}")
+        resolve_show_episodes(cursor, show, channel_number, skipped_files)
+    all_episodes = [show for show in all_episodes if show["episodes"]]
+
     conn.close()
+    if build_cancelled():
+        return False
 
     # Save skipped files
     if skipped_files:
@@ -377,163 +1385,75 @@ def generate_m3u(channel_number, playlist_paths):
             xbmc.log(f"{addon_name}: Logged {len(skipped_files)} skipped files to {skipped_file_path}", level=xbmc.LOGINFO)
         except Exception as e:
             xbmc.log(f"{addon_name}: Error writing skipped_files.json: {str(e)}", level=xbmc.LOGERROR)
-            progress_dialog.close()
-            xbmcgui.Dialog().ok(addon_name, "Failed to log skipped files.")
+            progress.finish("Failed to log skipped files.")
             return False
 
     if not all_episodes:
         xbmc.log(f"{addon_name}: No episodes found for channel {channel_number}", level=xbmc.LOGWARNING)
-        progress_dialog.close()
-        xbmcgui.Dialog().ok(addon_name, "No episodes found in selected playlists.")
+        progress.finish("No episodes found in selected playlists.")
         return False
 
-    # Prepare for M3U generation
-    m3u_content = ["#EXTM3U"]
-    m3u_entries = []
-    entry_count = 0
-    episode_indices = [0] * len(all_episodes)  # Track episode index per show
-    expected_show_orders = []  # Track show order per round for validation
-    xbmc.log(f"{addon_name}: Shows before processing for channel {channel_number}: {[show['showtitle'] for show in all_episodes]}", level=xbmc.LOGINFO)
-
-    # Round-robin through shows, randomizing order each round
-    round_num = 0
-    while entry_count < max_entries:
-        round_num += 1
-        # Use all shows, as episodes will cycle
-        round_shows = all_episodes.copy()
-        if not round_shows:
-            xbmc.log(f"{addon_name}: No shows available for channel {channel_number}, stopping at {entry_count} entries", level=xbmc.LOGINFO)
-            break
-
-        if rules["randomize_shows"]:
-            try:
-                random.seed(42 + entry_count)  # Unique seed per round for testing
-                random.shuffle(round_shows)
-                round_order = [show["showtitle"] for show in round_shows]
-                xbmc.log(f"{addon_name}: Round {round_num} show order for channel {channel_number}: {round_order}", level=xbmc.LOGINFO)
-                expected_show_orders.append(round_order)
-            except Exception as e:
-                xbmc.log(f"{addon_name}: Error shuffling shows for round {round_num}: {str(e)}", level=xbmc.LOGERROR)
-                progress_dialog.close()
-                xbmcgui.Dialog().ok(addon_name, "Failed to shuffle shows. Check kodi.log.")
-                return False
-        else:
-            round_shows.sort(key=lambda x: x["showtitle"])
-            round_order = [show["showtitle"] for show in round_shows]
-            xbmc.log(f"{addon_name}: Round {round_num} sorted show order for channel {channel_number}: {round_order}", level=xbmc.LOGINFO)
-            expected_show_orders.append(round_order)
-
-        # Process one episode from each show in this round's order
-        for i, show in enumerate(round_shows):
-            progress_dialog.update(int((entry_count + i) / max_entries * 100), f"Building M3U: Round {round_num}, Show {i + 1}/{len(round_shows)}")
-            show_idx = next(i for i, s in enumerate(all_episodes) if s["showtitle"] == show["showtitle"])
-            episodes = show["episodes"]
-            if not episodes:  # Skip empty shows
-                continue
-            # Cycle episode index using modulo
-            episode_idx = episode_indices[show_idx] % len(episodes)
-            episode = episodes[episode_idx]
-            showtitle = show["showtitle"]
-            season = episode.get("season", 0)
-            episode_num = episode.get("episode", 0)
-            title = episode.get("title", "Unknown")
-            filepath = episode.get("file", "")
-            duration = episode.get("runtime", 0)
-            m3u_entries.append(f"#EXTINF:{duration},{showtitle} S{season:02d}E{episode_num:02d} - {title}")
-            m3u_entries.append(filepath)
-            xbmc.log(f"{addon_name}: Added to M3U: {showtitle} S{season:02d}E{episode_num:02d} - {title} (duration: {duration}s)", level=xbmc.LOGDEBUG)
-            episode_indices[show_idx] += 1
-            entry_count += 1
-            if entry_count >= max_entries:
-                xbmc.log(f"{addon_name}: Reached max_entries {max_entries} for channel {channel_number}", level=xbmc.LOGINFO)
-                break
-        if entry_count >= max_entries:
-            break
+    # Plan the schedule
+    try:
+        plan = plan_round_robin(all_episodes, max_entries, rules, channel_number, collision_index, build_cancelled, progress)
+    except Exception as e:
+        xbmc.log(f"{addon_name}: Error planning schedule for channel {channel_number}: {str(e)}", level=xbmc.LOGERROR)
+        progress.finish("Failed to shuffle shows. Check kodi.log.")
+        return False
+    if plan is None:
+        return False
+    schedule, expected_show_orders = plan
+
+    if expected_show_orders is not None:
+        # Verify M3U order
+        actual_order = [all_episodes[show_idx]["showtitle"] for show_idx in schedule.show_order]
+        xbmc.log(f"{addon_name}: Actual M3U show order for channel {channel_number}: {actual_order}", level=xbmc.LOGINFO)
+
+        # Validate show order per round
+        entries_per_round = len(all_episodes)
+        for round_idx in range(len(expected_show_orders)):
+            start = round_idx * entries_per_round
+            end = min((round_idx + 1) * entries_per_round, len(actual_order))
+            round_actual = actual_order[start:end]
+            round_expected = expected_show_orders[round_idx][:len(round_actual)]
+            if round_actual != round_expected:
+                xbmc.log(f"{addon_name}: M3U order mismatch in round {round_idx + 1}! Expected: {round_expected}, Got: {round_actual}", level=xbmc.LOGERROR)
+
+    if not schedule:
+        xbmc.log(f"{addon_name}: No entries added to M3U for channel {channel_number}", level=xbmc.LOGWARNING)
+        progress.finish("No entries added to M3U file.")
+        return False
 
-    m3u_content.extend(m3u_entries)
+    if build_cancelled():
+        return False
 
-    # Verify M3U order
-    actual_order = []
-    for line in m3u_content[1::2]:
-        for show in all_episodes:
-            if show["showtitle"] in line:
-                actual_order.append(show["showtitle"])
-                break
-    xbmc.log(f"{addon_name}: Actual M3U show order for channel {channel_number}: {actual_order}", level=xbmc.LOGINFO)
-
-    # Validate show order per round
-    entries_per_round = len(all_episodes)
-    for round_idx in range(len(expected_show_orders)):
-        start = round_idx * entries_per_round
-        end = min((round_idx + 1) * entries_per_round, len(actual_order))
-        round_actual = actual_order[start:end]
-        round_expected = expected_show_orders[round_idx][:len(round_actual)]
-        if round_actual != round_expected:
-            xbmc.log(f"{addon_name}: M3U order mismatch in round {round_idx + 1}! Expected: {round_expected}, Got: {round_actual}", level=xbmc.LOGERROR)
-
-    if not m3u_entries:
-        xbmc.log(f"{addon_name}: No entries added to M3U for channel {channel_number}", level=xbmc.LOGWARNING)
-        progress_dialog.close()
-        xbmcgui.Dialog().ok(addon_name, "No entries added to M3U file.")
+    # Write M3U file (or lineup section), replacing any progressive head in one step
+    if not write_channel_output(channel_number, schedule.to_m3u(), settings, assemble):
+        progress.finish(f"Failed to create M3U file for Channel {channel_number}. Check kodi.log.")
         return False
 
-    # Write M3U file
-    m3u_path = os.path.join(data_path, f"channel_{channel_number}.m3u")
-    xbmc.log(f"{addon_name}: Attempting to write M3U file to {m3u_path}", level=xbmc.LOGINFO)
-    try:
-        # Ensure directory exists
-        m3u_dir = os.path.dirname(m3u_path)
-        if not xbmcvfs.exists(m3u_dir):
-            xbmcvfs.mkdirs(m3u_dir)
-            xbmc.log(f"{addon_name}: Created directory {m3u_dir}", level=xbmc.LOGINFO)
+    build_time = time.monotonic() - build_started
+    if time_to_playable is None:
+        time_to_playable = build_time
+    xbmc.log(f"{addon_name}: Build stats for channel {channel_number}: {len(schedule)} entries in {build_time:.2f}s, first playable after {time_to_playable:.2f}s", level=xbmc.LOGINFO)
 
-        # Delete existing file
-        if xbmcvfs.exists(m3u_path):
-            try:
-                xbmcvfs.delete(m3u_path)
-                xbmc.log(f"{addon_name}: Deleted existing M3U file {m3u_path}", level=xbmc.LOGINFO)
-            except Exception as e:
-                xbmc.log(f"{addon_name}: Error deleting existing M3U file {m3u_path}: {str(e)}", level=xbmc.LOGERROR)
-                progress_dialog.close()
-                xbmcgui.Dialog().ok(addon_name, f"Failed to delete existing M3U file. Check kodi.log.")
-                return False
+    # The fingerprint is only saved once everything the build produces is in place, so a failed
+    # publish or index save is retried by the next rebuild instead of being skipped as unchanged
+    outputs_saved = True
+    if cache_mode == "builder" and not publish_shared_schedule(cache_dir, channel_number, cache_key, schedule):
+        xbmc.log(f"{addon_name}: Channel {channel_number} was not published to the shared cache", level=xbmc.LOGWARNING)
+        outputs_saved = False
 
-        # Try writing with xbmcvfs
-        try:
-            with xbmcvfs.File(m3u_path, "w") as file:
-                file.write("\n".join(m3u_content))
-            xbmc.log(f"{addon_name}: Successfully wrote M3U file using xbmcvfs to {m3u_path} with {len(m3u_entries) // 2} entries", level=xbmc.LOGINFO)
-        except Exception as e:
-            xbmc.log(f"{addon_name}: xbmcvfs write failed for {m3u_path}: {str(e)}", level=xbmc.LOGERROR)
-            # Fallback to standard Python I/O
-            try:
-                real_path = xbmcvfs.translatePath(m3u_path)
-                with open(real_path, "w", encoding="utf-8") as file:
-                    file.write("\n".join(m3u_content))
-                xbmc.log(f"{addon_name}: Successfully wrote M3U file using Python I/O to {real_path} with {len(m3u_entries) // 2} entries", level=xbmc.LOGINFO)
-            except Exception as e:
-                xbmc.log(f"{addon_name}: Python I/O write failed for {real_path}: {str(e)}", level=xbmc.LOGERROR)
-                progress_dialog.close()
-                xbmcgui.Dialog().ok(addon_name, f"Failed to create M3U file at {m3u_path}. Check kodi.log.")
-                return False
+    if collision_index is not None:
+        # Only this channel's file changes; the other channels' files are left as-is
+        if not collision_index.save_channel(str(channel_number), schedule.airings()):
+            xbmc.log(f"{addon_name}: Collision index for channel {channel_number} was not saved", level=xbmc.LOGWARNING)
+            outputs_saved = False
 
-        # Verify file exists
-        if xbmcvfs.exists(m3u_path):
-            xbmc.log(f"{addon_name}: Confirmed M3U file exists at {m3u_path}", level=xbmc.LOGINFO)
-            progress_dialog.close()
-            xbmcgui.Dialog().ok(addon_name, f"Channel {channel_number} Creation Success")
-            return True
-        else:
-            xbmc.log(f"{addon_name}: M3U file not found at {m3u_path} after writing", level=xbmc.LOGERROR)
-            progress_dialog.close()
-            xbmcgui.Dialog().ok(addon_name, f"M3U file not created at {m3u_path}. Check kodi.log.")
-            return False
+    save_channel_fingerprint(channel_number, fingerprint if outputs_saved else None)
 
-    except Exception as e:
-        xbmc.log(f"{addon_name}: General error writing M3U file {m3u_path}: {str(e)}", level=xbmc.LOGERROR)
-        progress_dialog.close()
-        xbmcgui.Dialog().ok(addon_name, f"Failed to create M3U file. Check kodi.log.")
-        return False
+    progress.finish(f"Channel {channel_number} Creation Success")
+    return True
 
 def validate_channel_number(number, channels, exclude_index=None):
     """Check if channel number is unique, excluding the channel at exclude_index (for edits)."""
@@ -597,32 +1517,166 @@ def configure_advanced_rules(channel_index=None):
     # Save updated channels
     save_channels(channels)
 
-def select_playlists():
-    """Display a dialog to select Smart Playlists and return their paths."""
-    addon_name = "script.smart.channels"
-    playlist_dirs = [
-        "special://profile/playlists/video/",
-        "special://profile/playlists/mixed/"
-    ]
+def playlist_mtime(playlist_path):
+    """Return a playlist's modification time, or None if it cannot be read."""
+    try:
+        return xbmcvfs.Stat(playlist_path).st_mtime()
+    except Exception:
+        return None
+
+def load_playlist_stats():
+    """Load the playlist statistics index. Only reads the index file, so it is safe on the UI thread."""
+    index = read_json_file(playlist_stats_file)
+    if not index or index.get("format") != PLAYLIST_STATS_FORMAT:
+        return {"format": PLAYLIST_STATS_FORMAT, "playlists": {}}
+    return index
+
+def compute_playlist_stats(playlist_path, cursor):
+    """Count the shows, episodes and total runtime in seconds of a playlist."""
+    episodes = get_episodes_from_playlist(playlist_path, apply_order=False)
+    runtime = 0
+    for ep in episodes:
+        try:
+            runtime += lookup_episode_duration(cursor, ep)
+        except Exception as e:
+            xbmc.log(f"{addon_name}: Error querying duration for {ep.file}: {str(e)}", level=xbmc.LOGDEBUG)
+    return {"shows": len({ep.showtitle for ep in episodes}), "episodes": len(episodes), "runtime": runtime}
+
+def wait_for_idle_builds(monitor):
+    """Wait until no channel build is queued or running. Returns False if Kodi is shutting down."""
+    while not build_queue.is_idle():
+        if monitor.waitForAbort(1):
+            return False
+    return not monitor.abortRequested()
+
+def refresh_playlist_stats(playlist_paths):
+    """Recompute the index entries whose playlist or library has changed and drop playlists no longer listed.
+
+    An entry is kept while its playlist's mtime and the library generation match; a playlist that was
+    only touched keeps its entry when its content hash still matches.
+    """
+    monitor = xbmc.Monitor()
+    if not wait_for_idle_builds(monitor):
+        return
+    index = load_playlist_stats()
+    library = get_library_generation()
+    entries = {path: entry for path, entry in index["playlists"].items() if path in playlist_paths}
+    stale = []
+    for playlist_path in playlist_paths:
+        entry = entries.get(playlist_path)
+        mtime = playlist_mtime(playlist_path)
+        if entry and entry.get("library") == library and entry.get("mtime") == mtime:
+            continue
+        content_hash = playlist_content_hash(playlist_path)
+        if entry and entry.get("library") == library and entry.get("hash") == content_hash:
+            entry["mtime"] = mtime
+            continue
+        stale.append((playlist_path, mtime, content_hash))
+
+    index = {"format": PLAYLIST_STATS_FORMAT, "playlists": entries}
+    if stale:
+        xbmc.log(f"{addon_name}: Refreshing statistics for {len(stale)} of {len(playlist_paths)} playlists", level=xbmc.LOGINFO)
+        db_path = xbmcvfs.translatePath("special://database/MyVideos131.db")
+        try:
+            conn = sqlite3.connect(db_path)
+        except Exception as e:
+            xbmc.log(f"{addon_name}: Error connecting to MyVideos131.db: {str(e)}", level=xbmc.LOGERROR)
+            return
+        try:
+            cursor = conn.cursor()
+            for i, (playlist_path, mtime, content_hash) in enumerate(stale):
+                # Channel builds take priority over counting
+                if not wait_for_idle_builds(monitor):
+                    break
+                entry = compute_playlist_stats(playlist_path, cursor)
+                entry.update({"mtime": mtime, "hash": content_hash, "library": library})
+                entries[playlist_path] = entry
+                # Save as we go so a picker opened meanwhile already shows the finished playlists
+                if i % 10 == 9:
+                    atomic_write(playlist_stats_file, json.dumps(index))
+        finally:
+            conn.close()
+    atomic_write(playlist_stats_file, json.dumps(index))
+
+class PlaylistStatsRefresher:
+    """Refreshes the playlist statistics index on a background thread, one refresh at a time."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pending = None
+
+    def submit(self, playlist_paths):
+        with self._lock:
+            self._pending = list(playlist_paths)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"{addon_id}.playlist_stats")
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._worker = None
+                    return
+                playlist_paths, self._pending = self._pending, None
+            try:
+                refresh_playlist_stats(playlist_paths)
+            except Exception as e:
+                xbmc.log(f"{addon_name}: Playlist statistics refresh failed: {str(e)}", level=xbmc.LOGERROR)
+
+    def wait(self):
+        """Block until the running refresh has finished."""
+        while True:
+            with self._lock:
+                worker = self._worker
+            if worker is None:
+                return
+            worker.join()
+
+playlist_stats_refresher = PlaylistStatsRefresher()
+
+def format_playlist_stats(entry):
+    """Describe a playlist index entry for the playlist picker."""
+    hours, minutes = divmod(entry["runtime"] // 60, 60)
+    return f"{entry['shows']} shows, {entry['episodes']} episodes, {hours}h {minutes:02d}m"
+
+def list_smart_playlists():
+    """Return the paths of all .xsp files in the playlist directories."""
     playlists = []
-    
-    # Collect all .xsp files from playlist directories
-    for dir_path in playlist_dirs:
+    for dir_path in PLAYLIST_DIRS:
         translated_dir = xbmcvfs.translatePath(dir_path)
         if xbmcvfs.exists(translated_dir):
             dirs, files = xbmcvfs.listdir(translated_dir)
             for file in files:
                 if file.endswith(".xsp"):
                     playlists.append(os.path.join(dir_path, file))
+    return playlists
+
+def select_playlists():
+    """Display a dialog to select Smart Playlists and return their paths."""
+    addon_name = "script.smart.channels"
+    playlists = list_smart_playlists()
     
     if not playlists:
-        xbmc.log(f"{addon_name}: No .xsp playlists found in {playlist_dirs}", level=xbmc.LOGWARNING)
+        xbmc.log(f"{addon_name}: No .xsp playlists found in {PLAYLIST_DIRS}", level=xbmc.LOGWARNING)
         xbmcgui.Dialog().ok(addon_name, "No Smart Playlists found.")
         return []
 
+    # Show each playlist with its cached statistics; stale ones are recounted in the background
+    stats = load_playlist_stats()["playlists"]
+    items = []
+    for p in playlists:
+        item = xbmcgui.ListItem(os.path.basename(p))
+        entry = stats.get(p)
+        if entry and entry.get("mtime") == playlist_mtime(p):
+            item.setLabel2(format_playlist_stats(entry))
+        else:
+            item.setLabel2("Counting episodes...")
+        items.append(item)
+    playlist_stats_refresher.submit(playlists)
+
     # Display multi-select dialog
-    playlist_names = [os.path.basename(p) for p in playlists]
-    selected = xbmcgui.Dialog().multiselect("Select Playlists for Channel", playlist_names)
+    selected = xbmcgui.Dialog().multiselect("Select Playlists for Channel", items, useDetails=True)
     if selected is None or not selected:
         xbmc.log(f"{addon_name}: No playlists selected", level=xbmc.LOGINFO)
         return []
@@ -680,9 +1734,9 @@ def add_channel():
     if configure_rules:
         configure_advanced_rules(len(channels) - 1)
 
-    # Generate M3U file
+    # Generate M3U file (None means it is building in the background or was cancelled)
     if playlists:
-        if not generate_m3u(channel_number, playlists):
+        if build_channel(channel_number, playlists) is False:
             dialog.ok(addon_name, "Channel created, but M3U file generation failed.")
     
     return channel_data
@@ -707,9 +1761,16 @@ def edit_channel_number_name(channels, channel_index):
         new_name = "Empty Channel"
 
     # Update channel
+    old_number = current_channel['number']
     channels[channel_index]['number'] = new_number
     channels[channel_index]['name'] = new_name
     save_channels(channels)
+    if new_number != old_number:
+        if not rename_channel_output(old_number, new_number):
+            dialog.ok(addon_name, "Channel updated, but its M3U file could not be renamed. Check kodi.log.")
+            return
+    elif xbmcvfs.exists(lineup_file):
+        assemble_lineup()  # Pick up the new tvg-name
     dialog.ok(addon_name, addon.getLocalizedString(32018))  # Channel updated successfully
 
 def display_channels():
@@ -730,6 +1791,8 @@ def display_channels():
 def manage_channels():
     """Show Add/Edit dialog and handle user selection."""
     dialog = xbmcgui.Dialog()
+    # Warm the playlist statistics so the playlist picker can show them when it opens
+    playlist_stats_refresher.submit(list_smart_playlists())
     options = ["Add", "Edit"]
     choice = dialog.select("Manage Channels", options)
 
@@ -752,7 +1815,7 @@ def manage_channels():
         if channel_index == -1:
             return
 
-        edit_options = ["Edit Channel Number/Name", "Delete Channel", "Delete Playlist", "Add Playlist", "Configure Advanced Rules"]
+        edit_options = ["Edit Channel Number/Name", "Delete Channel", "Delete Playlist", "Add Playlist", "Configure Advanced Rules", "Rebuild Channel"]
         edit_choice = dialog.select(f"Edit Channel: {channels[channel_index]['name']}", edit_options)
         if edit_choice == -1:
             return
@@ -763,13 +1826,7 @@ def manage_channels():
             channel_number = channels[channel_index]["number"]
             channels.pop(channel_index)
             save_channels(channels)
-            m3u_path = os.path.join(data_path, f"channel_{channel_number}.m3u")
-            if xbmcvfs.exists(m3u_path):
-                try:
-                    xbmcvfs.delete(m3u_path)
-                    xbmc.log(f"{addon_name}: Successfully deleted M3U file for channel {channel_number}", level=xbmc.LOGINFO)
-                except Exception as e:
-                    xbmc.log(f"{addon_name}: Error deleting M3U file {m3u_path}: {str(e)}", level=xbmc.LOGERROR)
+            remove_channel_outputs([channel_number])
             dialog.ok(addon_name, addon.getLocalizedString(32008))  # Channel deleted successfully
         elif edit_choice == 2:  # Delete Playlist
             playlists = channels[channel_index]["playlists"]
@@ -801,12 +1858,28 @@ def manage_channels():
                 dialog.ok(addon_name, addon.getLocalizedString(32012))  # Playlists added successfully
         elif edit_choice == 4:  # Configure Advanced Rules
             configure_advanced_rules(channel_index)
+        elif edit_choice == 5:  # Rebuild Channel
+            channel = channels[channel_index]
+            if not channel["playlists"]:
+                dialog.ok(addon_name, addon.getLocalizedString(32011))  # Channel Empty
+                return
+            force = dialog.yesno(addon_name, "Force a full rebuild, even if nothing changed?")
+            if build_channel(channel["number"], channel["playlists"], force) is False:
+                dialog.ok(addon_name, "M3U file generation failed.")
             
  
 def update_settings():
     """Update settings.json with the current addon settings."""
     settings = load_settings()
     settings['playlist_upper_limit'] = int(addon.getSetting('playlist_upper_limit') or 50)
+    settings['shared_cache_mode'] = SHARED_CACHE_MODES[int(addon.getSetting('shared_cache_mode') or 0)]
+    settings['shared_cache_path'] = addon.getSetting('shared_cache_path')
+    settings['m3u_output_mode'] = M3U_OUTPUT_MODES[int(addon.getSetting('m3u_output_mode') or 0)]
+    settings['build_progress_mode'] = BUILD_PROGRESS_MODES[int(addon.getSetting('build_progress_mode') or 0)]
+    settings['avoid_collisions'] = addon.getSetting('avoid_collisions') == 'true'
+    settings['collision_window'] = int(addon.getSetting('collision_window') or 30)
+    settings['progressive_build'] = addon.getSetting('progressive_build') == 'true'
+    settings['progressive_head_entries'] = int(addon.getSetting('progressive_head_entries') or 10)
     save_settings(settings)
 
 class SettingsMonitor(xbmc.Monitor):
@@ -837,6 +1910,12 @@ def main():
             manage_channels()
         elif action == "delete_all_channels":
             delete_all_channels()
+        elif action == "sync_shared_cache":
+            sync_shared_cache()
+        elif action == "cancel_builds":
+            cancel_builds()
+        elif action == "rebuild_all_channels":
+            rebuild_all_channels()
         else:
             xbmc.log(f"{addon_name}: Unknown action {action}", level=xbmc.LOGERROR)
             # Fallback to main menu
@@ -856,4 +1935,7 @@ def main():
             display_channels()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    # Keep the script alive until background channel builds and statistics refreshes have finished
+    build_queue.wait()
+    playlist_stats_refresher.wait()
\ No newline at end of file
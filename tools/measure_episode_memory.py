@@ -0,0 +1,71 @@
+"""Measure the memory held by library episodes as JSON-RPC dicts versus compact Episode records.
+
+Run from the repository root, outside Kodi:
+
+    python tools/measure_episode_memory.py
+    python tools/measure_episode_memory.py --episodes 250000
+
+A synthetic VideoLibrary.GetEpisodes response is decoded once per mode and tracemalloc reports the
+memory still held by the resulting episode list, plus the peak while building it.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+from benchmark_planner import ADDON_DIR, install_kodi_stand_ins
+
+
+def make_response(episode_count):
+    """Build a GetEpisodes response shaped like Kodi's, with 100 episodes per show on a network share."""
+    episodes = []
+    for i in range(episode_count):
+        showtitle = f"Show Title Number {i // 100}"
+        season = 1 + (i % 100) // 25
+        episodes.append({
+            "episodeid": i,
+            "label": f"Episode {i % 100}",
+            "showtitle": showtitle,
+            "season": season,
+            "episode": i % 25 + 1,
+            "title": f"Episode Title {i}",
+            "file": f"smb://nas/media/TV Shows/{showtitle}/Season {season:02d}/{showtitle} S{season:02d}E{i % 25 + 1:02d}.mkv",
+            "runtime": 1320,
+            "tvshowid": i // 100
+        })
+    return json.dumps({"result": {"episodes": episodes}})
+
+
+def measure(response, convert):
+    """Return (retained, peak) bytes for decoding response and optionally converting each episode."""
+    gc.collect()
+    tracemalloc.start()
+    episodes = json.loads(response)["result"]["episodes"]
+    if convert is not None:
+        episodes = [convert(ep) for ep in episodes]
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del episodes
+    return retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=100000)
+    args = parser.parse_args()
+
+    install_kodi_stand_ins()
+    sys.path.insert(0, ADDON_DIR)
+    import addon
+
+    response = make_response(args.episodes)
+    for name, convert in (("dicts", None), ("Episode", addon.Episode.from_jsonrpc)):
+        retained, peak = measure(response, convert)
+        print(f"{args.episodes} episodes as {name}: {retained / 1e6:.1f} MB retained, {peak / 1e6:.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()